@@ -4,14 +4,22 @@ Office scraper for Vietnamese real estate sites.
 Scrapes office-for-rent listings in Da Nang and outputs JSON.
 """
 
-import json
+import asyncio
 import os
+import sqlite3
 import sys
+import threading
 import time
 import hashlib
 from datetime import datetime, date
+from array import array
+from math import radians, cos, sin, nan
 from pathlib import Path
 
+import numpy as np
+import orjson
+from rtree import index
+
 # Add parent to path for module imports
 sys.path.insert(0, str(Path(__file__).parent))
 
@@ -25,43 +33,114 @@ from sites.homedy import HomedyScraper
 
 OUTPUT_DIR = Path(__file__).parent.parent / "data"
 OUTPUT_FILE = OUTPUT_DIR / "scraped_offices.json"
+GEOCODE_CACHE_DB = OUTPUT_DIR / "geocache.db"
 
 SCRAPERS = [
-    ("batdongsan.com.vn", BatDongSanScraper),
-    ("alonhadat.com.vn", AlonhadatScraper),
-    ("chotot.com", ChototScraper),
-    ("muaban.net", MuabanScraper),
-    ("dothi.net", DothiScraper),
-    ("cafeland.vn", CafelandScraper),
-    ("homedy.com", HomedyScraper),
+    (scraper_class.NAME, scraper_class)
+    for scraper_class in (
+        BatDongSanScraper,
+        AlonhadatScraper,
+        ChototScraper,
+        MuabanScraper,
+        DothiScraper,
+        CafelandScraper,
+        HomedyScraper,
+    )
 ]
 
-
-def deduplicate(listings):
-    """Remove duplicate listings based on address proximity and name similarity."""
-    from math import radians, cos, sin, asin, sqrt
-
-    def haversine(lat1, lng1, lat2, lng2):
-        lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-        dlat = lat2 - lat1
-        dlng = lng2 - lng1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-        return 6371 * 2 * asin(sqrt(a))
-
-    unique = []
-    for listing in listings:
-        is_dup = False
-        for existing in unique:
-            if (listing.get("lat") and listing.get("lng") and
-                existing.get("lat") and existing.get("lng")):
-                dist = haversine(listing["lat"], listing["lng"],
-                                existing["lat"], existing["lng"])
-                if dist < 0.1:  # within 100m
-                    is_dup = True
-                    break
-        if not is_dup:
-            unique.append(listing)
-    return unique
+# Resources the scrapers never read; aborting them cuts page weight
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+
+
+class Dedup:
+    """Incrementally keep listings that are not within 100m of an already kept one."""
+
+    # 0.001 deg (~111m) bbox around a point covers the 100m radius
+    DELTA = 0.001
+    # Haversine "a" term for 100m; comparing against it skips asin/sqrt entirely
+    MAX_A = sin(0.1 / 6371 / 2) ** 2
+
+    def __init__(self, existing=()):
+        """Start from already-deduplicated listings, which are kept without checks."""
+        self.items = []
+        # Coordinates of kept items as parallel float arrays (radians, NaN if missing)
+        self.lats = array("d")
+        self.lngs = array("d")
+        self.cos_lats = array("d")
+        # Exact-repost fingerprints, checked before any distance math
+        self._url_keys = set()
+        self._name_keys = set()
+
+        # Stream-loading the R-tree STR-packs it, giving a tighter tree than one-by-one inserts
+        entries = []
+        for listing in existing:
+            if self._store(listing, *self._fingerprints(listing)):
+                entries.append((len(self.items) - 1, self._bbox(listing), None))
+        self.idx = index.Index(iter(entries)) if entries else index.Index()
+
+    def add(self, listing):
+        """Keep listing unless it duplicates a kept one; return whether it was kept."""
+        url_key, name_key = self._fingerprints(listing)
+        if url_key in self._url_keys or name_key in self._name_keys:
+            return False
+
+        lat, lng = listing.get("lat"), listing.get("lng")
+        if lat and lng and self._is_dup(lat, lng):
+            return False
+        if self._store(listing, url_key, name_key):
+            self.idx.insert(len(self.items) - 1, self._bbox(listing))
+        return True
+
+    def _store(self, listing, url_key, name_key):
+        """Append listing and its fingerprints to the kept columns; return whether it has coordinates."""
+        if url_key:
+            self._url_keys.add(url_key)
+        if name_key:
+            self._name_keys.add(name_key)
+
+        self.items.append(listing)
+        lat, lng = listing.get("lat"), listing.get("lng")
+        if lat and lng:
+            lat_r = radians(lat)
+            self.lats.append(lat_r)
+            self.lngs.append(radians(lng))
+            self.cos_lats.append(cos(lat_r))
+            return True
+        self.lats.append(nan)
+        self.lngs.append(nan)
+        self.cos_lats.append(nan)
+        return False
+
+    def _bbox(self, listing):
+        lat, lng = listing["lat"], listing["lng"]
+        return (lng, lat, lng, lat)
+
+    def _fingerprints(self, listing):
+        """(source, sourceUrl) and a per-source name|address digest; None where fields are empty."""
+        source = listing.get("source") or ""
+        url = listing.get("sourceUrl")
+        url_key = (source, url) if url else None
+
+        # Name alone (often generic and truncated) is not enough to call a repost
+        name, address = listing.get("name") or "", listing.get("address") or ""
+        name_key = None
+        if name and address:
+            name_key = hashlib.blake2b(f"{source}|{name}|{address}".encode(), digest_size=8).digest()
+        return url_key, name_key
+
+    def _is_dup(self, lat, lng):
+        d = self.DELTA
+        cand = np.fromiter(self.idx.intersection((lng - d, lat - d, lng + d, lat + d)), dtype=np.intp)
+        if not cand.size:
+            return False
+        # Fancy indexing copies, so no buffer view outlives this call and the arrays can still grow
+        lat_c = np.frombuffer(self.lats, dtype=np.float64)[cand]
+        lng_c = np.frombuffer(self.lngs, dtype=np.float64)[cand]
+        cos_c = np.frombuffer(self.cos_lats, dtype=np.float64)[cand]
+        lat_r, lng_r = radians(lat), radians(lng)
+        a = (np.sin((lat_c - lat_r) / 2) ** 2
+             + cos(lat_r) * cos_c * np.sin((lng_c - lng_r) / 2) ** 2)
+        return bool((a < self.MAX_A).any())  # within 100m
 
 
 def calculate_months_on_market(posting_date_str):
@@ -77,39 +156,125 @@ def calculate_months_on_market(posting_date_str):
         return None
 
 
-def geocode_address(address):
-    """Geocode an address using Nominatim (free)."""
-    from geopy.geocoders import Nominatim
+def geocode_address(address, geocode):
+    """Geocode an address using Nominatim (free).
+
+    Returns (None, None) when Nominatim has no match, and None when the
+    lookup itself failed (timeout, rate limit, network) so it can be retried.
+    """
     from geopy.exc import GeocoderTimedOut
 
-    geolocator = Nominatim(user_agent="office-analyzer-danang")
     try:
         # Try with full address first
-        location = geolocator.geocode(f"{address}, Đà Nẵng, Vietnam", timeout=10)
+        location = geocode(f"{address}, Đà Nẵng, Vietnam", timeout=10)
         if location:
             return location.latitude, location.longitude
 
         # Try simplified
         simplified = address.split(",")[0].strip()
-        location = geolocator.geocode(f"{simplified}, Da Nang, Vietnam", timeout=10)
+        location = geocode(f"{simplified}, Da Nang, Vietnam", timeout=10)
         if location:
             return location.latitude, location.longitude
     except (GeocoderTimedOut, Exception) as e:
         print(f"  Geocoding failed for '{address}': {e}")
+        return None
     return None, None
 
 
-def normalize_listing(raw, source):
+class NominatimLimiter:
+    """Space requests min_interval apart on the monotonic clock, counting request time."""
+
+    def __init__(self, min_interval=1.05):
+        self.min_interval = min_interval
+        self.next = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            time.sleep(max(0.0, self.next - now))
+            self.next = max(now, self.next) + self.min_interval
+
+    def backoff(self, seconds):
+        """Hold off the next request for at least seconds (e.g. after a 429)."""
+        with self.lock:
+            self.next = max(self.next, time.monotonic() + seconds)
+
+
+def _normalize_address(address):
+    """Cache key for an address: lowercased with whitespace collapsed."""
+    return " ".join(address.lower().split())
+
+
+def geocode_addresses(addresses):
+    """Geocode each unique address once, reusing the on-disk cache."""
+    from geopy.geocoders import Nominatim
+    from geopy.exc import GeocoderRateLimited
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(GEOCODE_CACHE_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geo(addr TEXT PRIMARY KEY, lat REAL, lng REAL, ts INTEGER)"
+    )
+
+    results = {}
+    pending = {}
+    cached = 0
+    for address in addresses:
+        key = _normalize_address(address)
+        row = conn.execute("SELECT lat, lng FROM geo WHERE addr = ?", (key,)).fetchone()
+        if row is None:
+            pending.setdefault(key, []).append(address)
+        else:
+            cached += 1
+            if row[0] is not None:
+                results[address] = row
+
+    print(f"Geocoding {len(pending)} addresses ({cached} cached)")
+
+    if pending:
+        geolocator = Nominatim(user_agent="office-analyzer-danang")
+        # One shared limiter keeps us within Nominatim's 1 req/s policy
+        limiter = NominatimLimiter()
+
+        def geocode(query, **kwargs):
+            limiter.wait()
+            try:
+                return geolocator.geocode(query, **kwargs)
+            except GeocoderRateLimited as e:
+                # Respect Retry-After so the remaining addresses aren't rejected too
+                limiter.backoff(e.retry_after or 60)
+                raise
+
+        for key, originals in pending.items():
+            coords = geocode_address(originals[0], geocode)
+            if coords is None:
+                continue  # lookup failed; leave uncached so the next run retries
+            lat, lng = coords
+            # Misses are stored as NULL so known-bad addresses aren't re-queried
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO geo(addr, lat, lng, ts) VALUES (?, ?, ?, ?)",
+                    (key, lat, lng, int(time.time())),
+                )
+            if lat and lng:
+                for address in originals:
+                    results[address] = (lat, lng)
+
+    conn.close()
+    return results
+
+
+def normalize_listing(raw, source, geocoded=None):
     """Normalize a raw listing into standard format."""
     lat = raw.get("lat")
     lng = raw.get("lng")
 
-    # Geocode if no coordinates
+    # Fall back to batch-geocoded coordinates
     if not lat or not lng:
         address = raw.get("address", "")
-        if address:
-            lat, lng = geocode_address(address)
-            time.sleep(1.5)  # Rate limit geocoding
+        if address and geocoded:
+            lat, lng = geocoded.get(address, (None, None))
 
     if not lat or not lng:
         return None  # Skip listings we can't locate
@@ -144,18 +309,62 @@ def normalize_listing(raw, source):
 
 def merge_with_existing(new_listings):
     """Merge new listings with existing scraped data."""
+    d = Dedup()
     if OUTPUT_FILE.exists():
         try:
-            with open(OUTPUT_FILE) as f:
-                existing = json.load(f)
-            # Keep existing listings and add new ones
-            all_listings = existing + new_listings
-        except (json.JSONDecodeError, Exception):
-            all_listings = new_listings
+            # Existing listings were deduplicated on a previous run; only new ones are checked
+            d = Dedup(orjson.loads(OUTPUT_FILE.read_bytes()))
+        except (orjson.JSONDecodeError, Exception):
+            d = Dedup()
+
+    for listing in new_listings:
+        d.add(listing)
+    return d.items
+
+
+async def _block_assets(route):
+    """Abort asset requests, letting documents, scripts and XHR through."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
     else:
-        all_listings = new_listings
+        await route.continue_()
+
+
+async def _run_scraper(browser, source_name, scraper_class):
+    """Run a single site scraper in its own context, capturing any error."""
+    print(f"Scraping: {source_name}")
+    context = None
+    try:
+        context = await browser.new_context(locale="vi-VN", user_agent=scraper_class.USER_AGENT)
+        await context.route("**/*", _block_assets)
+        return source_name, await scraper_class().scrape_async(context), None
+    except Exception as e:
+        return source_name, [], str(e)
+    finally:
+        if context:
+            await context.close()
+
+
+async def scrape_all():
+    """Run all site scrapers concurrently against one shared browser."""
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        print("  Playwright not installed, skipping")
+        return [(source_name, [], None) for source_name, _ in SCRAPERS]
+
+    async with async_playwright() as p:
+        try:
+            browser = await p.chromium.launch(headless=True)
+        except Exception as e:
+            print(f"  Browser error: {e}")
+            return [(source_name, [], f"Browser error: {e}") for source_name, _ in SCRAPERS]
 
-    return deduplicate(all_listings)
+        results = await asyncio.gather(
+            *[_run_scraper(browser, source_name, scraper_class) for source_name, scraper_class in SCRAPERS]
+        )
+        await browser.close()
+    return results
 
 
 def main():
@@ -166,29 +375,41 @@ def main():
     all_listings = []
     errors = []
 
-    for source_name, scraper_class in SCRAPERS:
+    # Sites run concurrently, so wall time is bounded by the slowest one
+    print(f"\nScraping {len(SCRAPERS)} sites in parallel...")
+    results = asyncio.run(scrape_all())
+
+    scraped = []
+    for source_name, raw_listings, error in results:
+        if error:
+            print(f"  {source_name} ERROR: {error}")
+            errors.append((source_name, error))
+            continue
+        scraped.append((source_name, raw_listings))
+
+    # Geocode every address missing coordinates in one rate-limited batch
+    addresses = sorted({
+        raw["address"]
+        for _, raw_listings in scraped
+        for raw in raw_listings
+        if (not raw.get("lat") or not raw.get("lng")) and raw.get("address")
+    })
+    geocoded = geocode_addresses(addresses) if addresses else {}
+
+    for source_name, raw_listings in scraped:
         print(f"\n{'─' * 40}")
-        print(f"Scraping: {source_name}")
+        print(f"Results: {source_name}")
         print(f"{'─' * 40}")
+        print(f"  Found {len(raw_listings)} raw listings")
 
-        try:
-            scraper = scraper_class()
-            raw_listings = scraper.scrape()
-            print(f"  Found {len(raw_listings)} raw listings")
-
-            normalized = []
-            for raw in raw_listings:
-                listing = normalize_listing(raw, source_name)
-                if listing:
-                    normalized.append(listing)
-
-            print(f"  Normalized: {len(normalized)} valid listings")
-            all_listings.extend(normalized)
+        normalized = []
+        for raw in raw_listings:
+            listing = normalize_listing(raw, source_name, geocoded)
+            if listing:
+                normalized.append(listing)
 
-        except Exception as e:
-            print(f"  ERROR: {e}")
-            errors.append((source_name, str(e)))
-            continue
+        print(f"  Normalized: {len(normalized)} valid listings")
+        all_listings.extend(normalized)
 
     print(f"\n{'=' * 60}")
     print(f"Total raw listings: {len(all_listings)}")
@@ -199,8 +420,7 @@ def main():
 
     # Save
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(final, f, ensure_ascii=False, indent=2)
+    OUTPUT_FILE.write_bytes(orjson.dumps(final, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
 
     print(f"\nSaved to: {OUTPUT_FILE}")
 
@@ -0,0 +1,60 @@
+"""Site scrapers and shared page-fetching and lxml helpers."""
+
+import asyncio
+
+from cssselect import GenericTranslator
+from lxml import etree
+
+_translator = GenericTranslator()
+
+
+async def load_html(page, url, wait_selector):
+    """Open url and return its HTML once wait_selector is in the DOM (500ms grace if it never is)."""
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+    try:
+        await page.wait_for_selector(wait_selector, timeout=10000, state="attached")
+    except PlaywrightTimeoutError:
+        await page.wait_for_timeout(500)
+    return await page.content()
+
+
+async def fetch_pages(context, urls, name, wait_selector=None, load=None):
+    """Fetch urls one at a time (~1 req/s per domain) and return load(page, url) for each.
+
+    name prefixes log lines, since sites run concurrently. load defaults to load_html with wait_selector. A page that fails yields None.
+    """
+    if load is None:
+        async def load(page, url):
+            return await load_html(page, url, wait_selector)
+
+    results = []
+    for page_num, url in enumerate(urls, 1):
+        print(f"  [{name}] Page {page_num}: {url}")
+        page = await context.new_page()
+        try:
+            results.append(await load(page, url))
+        except Exception as e:
+            print(f"    [{name}] Page error: {e}")
+            results.append(None)
+        finally:
+            await page.close()
+            await asyncio.sleep(1)
+    return results
+
+
+def descendant_selector(css):
+    """Compile a CSS selector that, like bs4's select, only matches below the element."""
+    return etree.XPath(_translator.css_to_xpath(css, prefix="descendant::"))
+
+
+def first_match(selector, el):
+    """Return the first element matching a precompiled selector, or None."""
+    matches = selector(el)
+    return matches[0] if matches else None
+
+
+def text_of(el):
+    """Text content of an element with whitespace collapsed."""
+    return " ".join(el.text_content().split())
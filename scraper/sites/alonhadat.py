@@ -1,84 +1,86 @@
 """Scraper for alonhadat.com.vn."""
 
-import time
 import re
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+from . import descendant_selector, fetch_pages, first_match, text_of
+
+
+_TRANS = str.maketrans({",": ".", " ": None})
+_RE_PRICE = re.compile(r"([\d.]+)\s*(triệu|tr)")
+_RE_AREA = re.compile(r"([\d,.]+)\s*m")
 
 
 class AlonhadatScraper:
+    NAME = "alonhadat.com.vn"
     BASE_URL = "https://alonhadat.com.vn"
     SEARCH_URL = f"{BASE_URL}/nha-dat/cho-thue/van-phong/3/da-nang.html"
     MAX_PAGES = 5
-
-    def scrape(self):
+    USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ITEM_SELECTOR = ".content-item, .property-item, .item-listing"
+    _SEL_ITEMS = CSSSelector(ITEM_SELECTOR)
+    _SEL_ITEMS_FALLBACK = CSSSelector("[class*='item']")
+    _SEL_TITLE = descendant_selector(".title, h3 a, .ct_title")
+    _SEL_LINK = descendant_selector("a[href]")
+    _SEL_PRICE = descendant_selector(".price, .ct_price, [class*='price']")
+    _SEL_AREA = descendant_selector(".area, .ct_dt, [class*='area']")
+    _SEL_ADDRESS = descendant_selector(".address, .ct_add, [class*='address']")
+
+    async def scrape_async(self, context):
         listings = []
+        urls = [self._page_url(page_num) for page_num in range(1, self.MAX_PAGES + 1)]
         try:
-            from playwright.sync_api import sync_playwright
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    locale="vi-VN",
-                    user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
-                page = context.new_page()
-
-                for page_num in range(1, self.MAX_PAGES + 1):
-                    url = self.SEARCH_URL if page_num == 1 else self.SEARCH_URL.replace(".html", f"/trang-{page_num}.html")
-                    print(f"  Page {page_num}: {url}")
-
-                    try:
-                        page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                        page.wait_for_timeout(3000)
-                        html = page.content()
-                        soup = BeautifulSoup(html, "html.parser")
-
-                        items = soup.select(".content-item, .property-item, .item-listing")
-                        if not items:
-                            items = soup.select("[class*='item']")
-
-                        print(f"    Found {len(items)} items")
-
-                        for item in items:
-                            try:
-                                listing = self._parse_listing(item)
-                                if listing:
-                                    listings.append(listing)
-                            except Exception:
-                                continue
-
-                        time.sleep(4)
-                    except Exception as e:
-                        print(f"    Page error: {e}")
-                        continue
-
-                browser.close()
-        except ImportError:
-            print("  Playwright not installed, skipping")
+            for html in await fetch_pages(context, urls, self.NAME, wait_selector=self.ITEM_SELECTOR):
+                if html:
+                    listings.extend(self._parse_page(html))
         except Exception as e:
-            print(f"  Browser error: {e}")
+            print(f"  [{self.NAME}] Browser error: {e}")
+
+        return listings
 
+    def _page_url(self, page_num):
+        return self.SEARCH_URL if page_num == 1 else self.SEARCH_URL.replace(".html", f"/trang-{page_num}.html")
+
+    def _parse_page(self, html):
+        tree = lxml.html.fromstring(html)
+
+        items = self._SEL_ITEMS(tree)
+        if not items:
+            items = self._SEL_ITEMS_FALLBACK(tree)
+
+        print(f"    [{self.NAME}] Found {len(items)} items")
+
+        listings = []
+        for item in items:
+            try:
+                listing = self._parse_listing(item)
+                if listing:
+                    listings.append(listing)
+            except Exception:
+                continue
         return listings
 
     def _parse_listing(self, item):
-        title_el = item.select_one(".title, h3 a, .ct_title")
-        name = title_el.get_text(strip=True) if title_el else ""
+        title_el = first_match(self._SEL_TITLE, item)
+        name = text_of(title_el) if title_el is not None else ""
 
         link = ""
-        link_el = item.select_one("a[href]")
-        if link_el:
+        link_el = first_match(self._SEL_LINK, item)
+        if link_el is not None:
             link = link_el.get("href", "")
             if link and not link.startswith("http"):
                 link = self.BASE_URL + link
 
-        price_el = item.select_one(".price, .ct_price, [class*='price']")
-        price = self._parse_price(price_el.get_text(strip=True)) if price_el else None
+        price_el = first_match(self._SEL_PRICE, item)
+        price = self._parse_price(text_of(price_el)) if price_el is not None else None
 
-        area_el = item.select_one(".area, .ct_dt, [class*='area']")
-        area = self._parse_area(area_el.get_text(strip=True)) if area_el else None
+        area_el = first_match(self._SEL_AREA, item)
+        area = self._parse_area(text_of(area_el)) if area_el is not None else None
 
-        addr_el = item.select_one(".address, .ct_add, [class*='address']")
-        address = addr_el.get_text(strip=True) if addr_el else ""
+        addr_el = first_match(self._SEL_ADDRESS, item)
+        address = text_of(addr_el) if addr_el is not None else ""
 
         if not name and not address:
             return None
@@ -94,8 +96,8 @@ class AlonhadatScraper:
     def _parse_price(self, text):
         if not text:
             return None
-        text = text.lower().replace(",", ".").replace(" ", "")
-        m = re.search(r"([\d.]+)\s*(triệu|tr)", text)
+        text = text.lower().translate(_TRANS)
+        m = _RE_PRICE.search(text)
         if m:
             return int(float(m.group(1)) * 1_000_000)
         return None
@@ -103,7 +105,7 @@ class AlonhadatScraper:
     def _parse_area(self, text):
         if not text:
             return None
-        m = re.search(r"([\d,.]+)\s*m", text)
+        m = _RE_AREA.search(text)
         if m:
             return int(float(m.group(1).replace(",", ".")))
         return None
@@ -1,95 +1,102 @@
 """Scraper for batdongsan.com.vn - Largest Vietnamese RE site."""
 
-import time
 import re
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+from . import descendant_selector, fetch_pages, first_match, text_of
+
+
+_TRANS = str.maketrans({",": ".", " ": None})
+_RE_PRICE = re.compile(r"([\d.]+)\s*(triệu|tr)")
+_RE_AREA = re.compile(r"([\d,.]+)\s*m")
+_RE_NUMBER = re.compile(r"([\d.]+)")
+_RE_DATE_DMY = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
+_RE_DAYS_AGO = re.compile(r"(\d+)\s*ngày")
+_RE_MONTHS_AGO = re.compile(r"(\d+)\s*tháng")
 
 
 class BatDongSanScraper:
+    NAME = "batdongsan.com.vn"
     BASE_URL = "https://batdongsan.com.vn"
     SEARCH_URL = f"{BASE_URL}/cho-thue-van-phong-da-nang"
     MAX_PAGES = 5
-
-    def scrape(self):
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ITEM_SELECTOR = ".js__card, .re__card-full, .product-item, [class*='ProductItem']"
+    _SEL_ITEMS = CSSSelector(ITEM_SELECTOR)
+    _SEL_ITEMS_FALLBACK = CSSSelector("a[href*='/cho-thue-van-phong-']")
+    _SEL_TITLE = descendant_selector(".re__card-title, .product-title, h3, .js__card-title")
+    _SEL_LINK = descendant_selector("a[href]")
+    _SEL_PRICE = descendant_selector(".re__card-config-price, .product-price, [class*='price']")
+    _SEL_AREA = descendant_selector(".re__card-config-area, .product-area, [class*='area']")
+    _SEL_ADDRESS = descendant_selector(".re__card-location, .product-location, [class*='location']")
+    _SEL_DATE = descendant_selector(".re__card-published-info-published-at, [class*='date'], time")
+
+    async def scrape_async(self, context):
         listings = []
+        urls = [self._page_url(page_num) for page_num in range(1, self.MAX_PAGES + 1)]
         try:
-            from playwright.sync_api import sync_playwright
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    locale="vi-VN",
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
-                page = context.new_page()
-
-                for page_num in range(1, self.MAX_PAGES + 1):
-                    url = self.SEARCH_URL if page_num == 1 else f"{self.SEARCH_URL}/p{page_num}"
-                    print(f"  Page {page_num}: {url}")
-
-                    try:
-                        page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                        page.wait_for_timeout(3000)
-                        html = page.content()
-                        soup = BeautifulSoup(html, "html.parser")
-
-                        items = soup.select(".js__card, .re__card-full, .product-item, [class*='ProductItem']")
-                        if not items:
-                            items = soup.select("a[href*='/cho-thue-van-phong-']")
-
-                        print(f"    Found {len(items)} items")
-
-                        for item in items:
-                            try:
-                                listing = self._parse_listing(item)
-                                if listing:
-                                    listings.append(listing)
-                            except Exception as e:
-                                continue
-
-                        time.sleep(4)
-                    except Exception as e:
-                        print(f"    Page error: {e}")
-                        continue
-
-                browser.close()
-        except ImportError:
-            print("  Playwright not installed, skipping")
+            for html in await fetch_pages(context, urls, self.NAME, wait_selector=self.ITEM_SELECTOR):
+                if html:
+                    listings.extend(self._parse_page(html))
         except Exception as e:
-            print(f"  Browser error: {e}")
+            print(f"  [{self.NAME}] Browser error: {e}")
+
+        return listings
 
+    def _page_url(self, page_num):
+        return self.SEARCH_URL if page_num == 1 else f"{self.SEARCH_URL}/p{page_num}"
+
+    def _parse_page(self, html):
+        tree = lxml.html.fromstring(html)
+
+        items = self._SEL_ITEMS(tree)
+        if not items:
+            items = self._SEL_ITEMS_FALLBACK(tree)
+
+        print(f"    [{self.NAME}] Found {len(items)} items")
+
+        listings = []
+        for item in items:
+            try:
+                listing = self._parse_listing(item)
+                if listing:
+                    listings.append(listing)
+            except Exception:
+                continue
         return listings
 
     def _parse_listing(self, item):
         # Title / name
-        title_el = item.select_one(".re__card-title, .product-title, h3, .js__card-title")
-        name = title_el.get_text(strip=True) if title_el else ""
+        title_el = first_match(self._SEL_TITLE, item)
+        name = text_of(title_el) if title_el is not None else ""
         if not name:
-            name = item.get_text(strip=True)[:80]
+            name = text_of(item)[:80]
 
         # Link
         link = item.get("href", "")
         if not link:
-            link_el = item.select_one("a[href]")
-            link = link_el.get("href", "") if link_el else ""
+            link_el = first_match(self._SEL_LINK, item)
+            link = link_el.get("href", "") if link_el is not None else ""
         if link and not link.startswith("http"):
             link = self.BASE_URL + link
 
         # Price
-        price_el = item.select_one(".re__card-config-price, .product-price, [class*='price']")
-        price = self._parse_price(price_el.get_text(strip=True)) if price_el else None
+        price_el = first_match(self._SEL_PRICE, item)
+        price = self._parse_price(text_of(price_el)) if price_el is not None else None
 
         # Area
-        area_el = item.select_one(".re__card-config-area, .product-area, [class*='area']")
-        area = self._parse_area(area_el.get_text(strip=True)) if area_el else None
+        area_el = first_match(self._SEL_AREA, item)
+        area = self._parse_area(text_of(area_el)) if area_el is not None else None
 
         # Address
-        addr_el = item.select_one(".re__card-location, .product-location, [class*='location']")
-        address = addr_el.get_text(strip=True) if addr_el else ""
+        addr_el = first_match(self._SEL_ADDRESS, item)
+        address = text_of(addr_el) if addr_el is not None else ""
 
         # Posting date
-        date_el = item.select_one(".re__card-published-info-published-at, [class*='date'], time")
-        posting_date = self._parse_date(date_el.get_text(strip=True)) if date_el else None
+        date_el = first_match(self._SEL_DATE, item)
+        posting_date = self._parse_date(text_of(date_el)) if date_el is not None else None
 
         if not name and not address:
             return None
@@ -107,14 +114,14 @@ class BatDongSanScraper:
         """Parse Vietnamese price text into VND/month number."""
         if not text:
             return None
-        text = text.lower().replace(",", ".").replace(" ", "")
+        text = text.lower().translate(_TRANS)
         try:
             # "50 triệu/tháng" or "50tr"
-            m = re.search(r"([\d.]+)\s*(triệu|tr)", text)
+            m = _RE_PRICE.search(text)
             if m:
                 return int(float(m.group(1)) * 1_000_000)
             # "100.000.000"
-            m = re.search(r"([\d.]+)", text.replace(".", ""))
+            m = _RE_NUMBER.search(text.replace(".", ""))
             if m and len(m.group(1)) > 6:
                 return int(m.group(1))
         except (ValueError, TypeError):
@@ -125,7 +132,7 @@ class BatDongSanScraper:
         """Parse area text into m2 number."""
         if not text:
             return None
-        m = re.search(r"([\d,.]+)\s*m", text)
+        m = _RE_AREA.search(text)
         if m:
             return int(float(m.group(1).replace(",", ".")))
         return None
@@ -136,16 +143,16 @@ class BatDongSanScraper:
             return None
         try:
             # "15/01/2025" format
-            m = re.search(r"(\d{2})/(\d{2})/(\d{4})", text)
+            m = _RE_DATE_DMY.search(text)
             if m:
                 return f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
             # "X ngày trước"
-            m = re.search(r"(\d+)\s*ngày", text)
+            m = _RE_DAYS_AGO.search(text)
             if m:
                 d = datetime.now() - timedelta(days=int(m.group(1)))
                 return d.strftime("%Y-%m-%d")
             # "X tháng trước"
-            m = re.search(r"(\d+)\s*tháng", text)
+            m = _RE_MONTHS_AGO.search(text)
             if m:
                 d = datetime.now() - timedelta(days=int(m.group(1)) * 30)
                 return d.strftime("%Y-%m-%d")
@@ -1,85 +1,87 @@
 """Scraper for cafeland.vn."""
 
-import time
 import re
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+from . import descendant_selector, fetch_pages, first_match, text_of
+
+
+_TRANS = str.maketrans({",": ".", " ": None})
+_RE_PRICE = re.compile(r"([\d.]+)\s*(triệu|tr)")
+_RE_AREA = re.compile(r"([\d,.]+)\s*m")
 
 
 class CafelandScraper:
+    NAME = "cafeland.vn"
     BASE_URL = "https://cafeland.vn"
     SEARCH_URL = f"{BASE_URL}/cho-thue/van-phong-tai-da-nang/"
     MAX_PAGES = 3
-
-    def scrape(self):
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ITEM_SELECTOR = ".realestate-item, .item-listing, [class*='estate']"
+    _SEL_ITEMS = CSSSelector(ITEM_SELECTOR)
+    _SEL_ITEMS_FALLBACK = CSSSelector(".item, [class*='item']")
+    _SEL_TITLE = descendant_selector("h4 a, h3 a, .title a, [class*='title']")
+    _SEL_LINK = descendant_selector("a[href]")
+    _SEL_PRICE = descendant_selector("[class*='price'], .price")
+    _SEL_AREA = descendant_selector("[class*='area'], .area")
+    _SEL_ADDRESS = descendant_selector("[class*='address'], [class*='location']")
+
+    async def scrape_async(self, context):
         listings = []
+        urls = [self._page_url(page_num) for page_num in range(1, self.MAX_PAGES + 1)]
         try:
-            from playwright.sync_api import sync_playwright
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    locale="vi-VN",
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
-                page = context.new_page()
-
-                for page_num in range(1, self.MAX_PAGES + 1):
-                    url = self.SEARCH_URL if page_num == 1 else f"{self.SEARCH_URL}p{page_num}/"
-                    print(f"  Page {page_num}: {url}")
-
-                    try:
-                        page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                        page.wait_for_timeout(3000)
-                        html = page.content()
-                        soup = BeautifulSoup(html, "html.parser")
-
-                        items = soup.select(".realestate-item, .item-listing, [class*='estate']")
-                        if not items:
-                            items = soup.select(".item, [class*='item']")
-
-                        print(f"    Found {len(items)} items")
-
-                        for item in items:
-                            try:
-                                listing = self._parse_listing(item)
-                                if listing:
-                                    listings.append(listing)
-                            except Exception:
-                                continue
-
-                        time.sleep(4)
-                    except Exception as e:
-                        print(f"    Page error: {e}")
-                        continue
-
-                browser.close()
-        except ImportError:
-            print("  Playwright not installed, skipping")
+            for html in await fetch_pages(context, urls, self.NAME, wait_selector=self.ITEM_SELECTOR):
+                if html:
+                    listings.extend(self._parse_page(html))
         except Exception as e:
-            print(f"  Browser error: {e}")
+            print(f"  [{self.NAME}] Browser error: {e}")
+
+        return listings
 
+    def _page_url(self, page_num):
+        return self.SEARCH_URL if page_num == 1 else f"{self.SEARCH_URL}p{page_num}/"
+
+    def _parse_page(self, html):
+        tree = lxml.html.fromstring(html)
+
+        items = self._SEL_ITEMS(tree)
+        if not items:
+            items = self._SEL_ITEMS_FALLBACK(tree)
+
+        print(f"    [{self.NAME}] Found {len(items)} items")
+
+        listings = []
+        for item in items:
+            try:
+                listing = self._parse_listing(item)
+                if listing:
+                    listings.append(listing)
+            except Exception:
+                continue
         return listings
 
     def _parse_listing(self, item):
-        title_el = item.select_one("h4 a, h3 a, .title a, [class*='title']")
-        name = title_el.get_text(strip=True) if title_el else ""
+        title_el = first_match(self._SEL_TITLE, item)
+        name = text_of(title_el) if title_el is not None else ""
 
         link = ""
-        if title_el and title_el.name == "a":
+        if title_el is not None and title_el.tag == "a":
             link = title_el.get("href", "")
         if not link:
-            link_el = item.select_one("a[href]")
-            link = link_el.get("href", "") if link_el else ""
+            link_el = first_match(self._SEL_LINK, item)
+            link = link_el.get("href", "") if link_el is not None else ""
         if link and not link.startswith("http"):
             link = self.BASE_URL + link
 
-        price_el = item.select_one("[class*='price'], .price")
-        price = self._parse_price(price_el.get_text(strip=True)) if price_el else None
+        price_el = first_match(self._SEL_PRICE, item)
+        price = self._parse_price(text_of(price_el)) if price_el is not None else None
 
-        area_el = item.select_one("[class*='area'], .area")
-        area = self._parse_area(area_el.get_text(strip=True)) if area_el else None
+        area_el = first_match(self._SEL_AREA, item)
+        area = self._parse_area(text_of(area_el)) if area_el is not None else None
 
-        addr_el = item.select_one("[class*='address'], [class*='location']")
-        address = addr_el.get_text(strip=True) if addr_el else ""
+        addr_el = first_match(self._SEL_ADDRESS, item)
+        address = text_of(addr_el) if addr_el is not None else ""
 
         if not name and not address:
             return None
@@ -95,8 +97,8 @@ class CafelandScraper:
     def _parse_price(self, text):
         if not text:
             return None
-        text = text.lower().replace(",", ".").replace(" ", "")
-        m = re.search(r"([\d.]+)\s*(triệu|tr)", text)
+        text = text.lower().translate(_TRANS)
+        m = _RE_PRICE.search(text)
         if m:
             return int(float(m.group(1)) * 1_000_000)
         return None
@@ -104,7 +106,7 @@ class CafelandScraper:
     def _parse_area(self, text):
         if not text:
             return None
-        m = re.search(r"([\d,.]+)\s*m", text)
+        m = _RE_AREA.search(text)
         if m:
             return int(float(m.group(1).replace(",", ".")))
         return None
@@ -1,74 +1,114 @@
 """Scraper for chotot.com - Uses API endpoint."""
 
-import time
+import asyncio
 import re
-import json
 from datetime import datetime
 
+import lxml.html
+import orjson
+from lxml.cssselect import CSSSelector
+
+from . import descendant_selector, fetch_pages, first_match, text_of
+
+
+_TRANS = str.maketrans({",": ".", " ": None})
+_RE_PRICE = re.compile(r"([\d.]+)\s*(triệu|tr)")
+
 
 class ChototScraper:
+    NAME = "chotot.com"
     # Chotot has a public API for listings
     API_URL = "https://gateway.chotot.com/v1/public/ad-listing"
     SEARCH_URL = "https://www.chotot.com/da-nang/van-phong-cho-thue"
     MAX_PAGES = 3
-
-    def scrape(self):
+    # ms; the API wait is counted from DOMContentLoaded, like the old fixed 4s wait
+    GOTO_TIMEOUT = 30000
+    API_TIMEOUT = 4000
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    _SEL_SCRIPTS = CSSSelector("script[type='application/json'], script#__NEXT_DATA__")
+    _SEL_ITEMS_FALLBACK = CSSSelector("[class*='AdItem'], [class*='listing'], .re__card-full")
+    _SEL_TITLE = descendant_selector("h3, [class*='title'], [class*='subject']")
+    _SEL_LINK = descendant_selector("a[href]")
+    _SEL_PRICE = descendant_selector("[class*='price']")
+
+    async def scrape_async(self, context):
         listings = []
+        urls = [self._page_url(page_num) for page_num in range(1, self.MAX_PAGES + 1)]
         try:
-            from playwright.sync_api import sync_playwright
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    locale="vi-VN",
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
-                page = context.new_page()
-
-                for page_num in range(1, self.MAX_PAGES + 1):
-                    url = self.SEARCH_URL if page_num == 1 else f"{self.SEARCH_URL}?page={page_num}"
-                    print(f"  Page {page_num}: {url}")
-
-                    try:
-                        page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                        page.wait_for_timeout(4000)
-                        html = page.content()
-
-                        # Try to extract from Next.js data or page content
-                        from bs4 import BeautifulSoup
-                        soup = BeautifulSoup(html, "html.parser")
-
-                        # Try script data
-                        scripts = soup.select("script[type='application/json'], script#__NEXT_DATA__")
-                        for script in scripts:
-                            try:
-                                data = json.loads(script.string)
-                                ads = self._extract_ads_from_json(data)
-                                listings.extend(ads)
-                            except (json.JSONDecodeError, Exception):
-                                continue
-
-                        # Fallback: parse HTML
-                        if not listings:
-                            items = soup.select("[class*='AdItem'], [class*='listing'], .re__card-full")
-                            print(f"    Found {len(items)} HTML items")
-                            for item in items:
-                                try:
-                                    listing = self._parse_html_listing(item)
-                                    if listing:
-                                        listings.append(listing)
-                                except Exception:
-                                    continue
-
-                        time.sleep(5)
-                    except Exception as e:
-                        print(f"    Page error: {e}")
-                        continue
-
-                browser.close()
-        except ImportError:
-            print("  Playwright not installed, skipping")
+            for result in await fetch_pages(context, urls, self.NAME, load=self._load_page):
+                if not result:
+                    continue
+                html, api_data = result
+                ads = self._extract_ads_from_json(api_data) if api_data else []
+                if ads:
+                    print(f"    [{self.NAME}] Found {len(ads)} API ads")
+                    listings.extend(ads)
+                else:
+                    listings.extend(self._parse_page(html))
         except Exception as e:
-            print(f"  Browser error: {e}")
+            print(f"  [{self.NAME}] Browser error: {e}")
+
+        return listings
+
+    def _page_url(self, page_num):
+        return self.SEARCH_URL if page_num == 1 else f"{self.SEARCH_URL}?page={page_num}"
+
+    async def _load_page(self, page, url):
+        """Open a search page; return its HTML and the ad-listing API payload, if one arrived."""
+        from playwright.async_api import Error as PlaywrightError
+
+        # Listen before navigating so a fast ad-listing XHR isn't missed; the listener
+        # outlives goto, and the XHR wait itself is capped after DOMContentLoaded below
+        api_wait = asyncio.ensure_future(
+            page.wait_for_response(self._is_api_response, timeout=self.GOTO_TIMEOUT + self.API_TIMEOUT)
+        )
+        api_wait.add_done_callback(lambda t: t.cancelled() or t.exception())
+        api_data = None
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=self.GOTO_TIMEOUT)
+            html = await page.content()
+            # Server-rendered pages already embed the ads, so no XHR will follow
+            if "__NEXT_DATA__" not in html or "list_id" not in html:
+                try:
+                    response = await asyncio.wait_for(api_wait, timeout=self.API_TIMEOUT / 1000)
+                    api_data = orjson.loads(await response.body())
+                except (asyncio.TimeoutError, PlaywrightError, orjson.JSONDecodeError):
+                    print(f"    [{self.NAME}] No API response, falling back to page content")
+                    html = await page.content()
+        finally:
+            api_wait.cancel()
+        return html, api_data
+
+    def _is_api_response(self, response):
+        return response.url.startswith(self.API_URL)
+
+    def _parse_page(self, html):
+        # Try to extract from Next.js data or page content
+        tree = lxml.html.fromstring(html)
+
+        listings = []
+
+        # Try script data
+        scripts = self._SEL_SCRIPTS(tree)
+        for script in scripts:
+            try:
+                data = orjson.loads(script.text or b"")
+                ads = self._extract_ads_from_json(data)
+                listings.extend(ads)
+            except (orjson.JSONDecodeError, Exception):
+                continue
+
+        # Fallback: parse HTML
+        if not listings:
+            items = self._SEL_ITEMS_FALLBACK(tree)
+            print(f"    [{self.NAME}] Found {len(items)} HTML items")
+            for item in items:
+                try:
+                    listing = self._parse_html_listing(item)
+                    if listing:
+                        listings.append(listing)
+                except Exception:
+                    continue
 
         return listings
 
@@ -76,19 +116,18 @@ class ChototScraper:
         """Extract ads from Next.js JSON data."""
         ads = []
 
-        def find_ads(obj, depth=0):
-            if depth > 10:
-                return
-            if isinstance(obj, dict):
+        # Iterative pre-order walk; values are pushed reversed to keep document order
+        stack = [data]
+        while stack:
+            obj = stack.pop()
+            t = type(obj)
+            if t is dict:
                 if "list_id" in obj and ("subject" in obj or "body" in obj):
                     ads.append(self._normalize_api_ad(obj))
-                for v in obj.values():
-                    find_ads(v, depth + 1)
-            elif isinstance(obj, list):
-                for item in obj:
-                    find_ads(item, depth + 1)
+                stack.extend(reversed(obj.values()))
+            elif t is list:
+                stack.extend(reversed(obj))
 
-        find_ads(data)
         return ads
 
     def _normalize_api_ad(self, ad):
@@ -107,19 +146,18 @@ class ChototScraper:
         }
 
     def _parse_html_listing(self, item):
-        from bs4 import BeautifulSoup
-        title_el = item.select_one("h3, [class*='title'], [class*='subject']")
-        name = title_el.get_text(strip=True) if title_el else ""
+        title_el = first_match(self._SEL_TITLE, item)
+        name = text_of(title_el) if title_el is not None else ""
 
         link = item.get("href", "")
         if not link:
-            link_el = item.select_one("a[href]")
-            link = link_el.get("href", "") if link_el else ""
+            link_el = first_match(self._SEL_LINK, item)
+            link = link_el.get("href", "") if link_el is not None else ""
         if link and not link.startswith("http"):
             link = "https://www.chotot.com" + link
 
-        price_el = item.select_one("[class*='price']")
-        price = self._parse_price(price_el.get_text(strip=True)) if price_el else None
+        price_el = first_match(self._SEL_PRICE, item)
+        price = self._parse_price(text_of(price_el)) if price_el is not None else None
 
         if not name:
             return None
@@ -134,8 +172,8 @@ class ChototScraper:
     def _parse_price(self, text):
         if not text:
             return None
-        text = text.lower().replace(",", ".").replace(" ", "")
-        m = re.search(r"([\d.]+)\s*(triệu|tr)", text)
+        text = text.lower().translate(_TRANS)
+        m = _RE_PRICE.search(text)
         if m:
             return int(float(m.group(1)) * 1_000_000)
         return None